@@ -1,30 +1,174 @@
+import atexit
+import functools
+import hashlib
+import os
+
 import pandas as pd
 import numpy as np
+from scipy.signal import lfilter
 import wrds
 
+CACHE_DIR = os.path.expanduser('~/.cache/har_rv')
+
+# Shared WRDS connection, opened lazily and reused across calls
+_DB = None
+
+def _get_db(username=None):
+    """
+    Lazily open and reuse a single authenticated WRDS connection.
+
+    The WRDS auth and TLS handshake cost hundreds of milliseconds per
+    connection, so repeated loads in one run share a connection instead
+    of opening and closing one each. Closed automatically at exit.
+
+    Args:
+        username (str): WRDS username (if None, wrds will prompt)
+
+    Returns:
+        wrds.Connection: Shared open connection
+    """
+    global _DB
+    if _DB is None:
+        _DB = wrds.Connection(wrds_username=username)
+    return _DB
+
+def _close_db():
+    global _DB
+    if _DB is not None:
+        _DB.close()
+        _DB = None
+
+atexit.register(_close_db)
+
+def _cached_sql(db, sql, params=None, cache_dir=CACHE_DIR):
+    """
+    Run a WRDS query through an on-disk parquet cache.
+
+    Each distinct query is keyed by the hash of its SQL text and bound
+    parameters, so repeat runs hit local disk instead of paying the
+    authenticated WRDS round-trip again.
+
+    Args:
+        db (wrds.Connection): Open WRDS connection
+        sql (str): SQL query text
+        params (dict): Query parameters passed through to raw_sql
+        cache_dir (str): Directory for cached parquet files
+
+    Returns:
+        pd.DataFrame: Query result
+    """
+    key_src = sql if params is None else f"{sql}|{sorted(params.items())!r}"
+    key = hashlib.sha1(key_src.encode()).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.parquet")
+
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+
+    df = db.raw_sql(sql, params=params)
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(path, engine='pyarrow', compression='zstd')
+    return df
+
+# Only these columns are used downstream of load_and_prepare_data
+UNIVERSE_COLUMNS = ['tic', 'gsector', 'mkvaltq', 'ipodate', 'rdq', 'datadate']
+
+def _ensure_parquet(csv_path):
+    """
+    Convert the WRDS CSV to a parquet sibling once and reuse it.
+
+    The CSV is only re-parsed when it is newer than the parquet file, so
+    the per-run cost drops from a full text parse to a columnar read of
+    already-typed data.
+
+    Args:
+        csv_path (str): Path to the WRDS NYSE TAQ dataset CSV file
+
+    Returns:
+        str: Path to the up-to-date parquet file
+    """
+    pq_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(pq_path) and os.path.getmtime(pq_path) >= os.path.getmtime(csv_path):
+        return pq_path
+
+    df = pd.read_csv(
+        csv_path,
+        engine='pyarrow',
+        usecols=UNIVERSE_COLUMNS,
+        dtype={'tic': 'string', 'gsector': 'Int16', 'mkvaltq': 'float64'},
+    )
+    # Coerce dates here rather than via parse_dates: the pyarrow engine
+    # rejects malformed date strings instead of nulling them
+    for col in ['ipodate', 'rdq', 'datadate']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    df.to_parquet(pq_path, compression='zstd')
+    return pq_path
+
 def load_and_prepare_data(csv_path):
     """
     Load WRDS Compustat Data and prepare it for analysis.
-    
+
+    Results are memoized per (path, mtime), so repeated calls within a
+    run skip the CSV parse entirely.
+
     Args:
         csv_path (str): Path to the WRDS NYSE TAQ dataset CSV file
-    
+
     Returns:
         pd.DataFrame: Prepared IPO universe dataframe
     """
-    # Load the data
-    df = pd.read_csv(csv_path)
-    
-    # Convert date strings to datetime objects
-    for col in ['ipodate', 'rdq', 'datadate']:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
-    
+    return _load_and_prepare_cached(csv_path, os.path.getmtime(csv_path))
+
+@functools.lru_cache(maxsize=8)
+def _load_and_prepare_cached(csv_path, mtime):
+    # Load the data columnar - dates and dtypes arrive already parsed
+    df = pd.read_parquet(
+        _ensure_parquet(csv_path),
+        columns=UNIVERSE_COLUMNS,
+        engine='pyarrow',
+    )
+
+    # Both columns are only ever used as equality-filter keys, so store
+    # them categorically: scans compare integer codes instead of strings
+    df['tic'] = df['tic'].astype('category')
+    df['gsector'] = df['gsector'].astype('category')
+
     # Filter for valid IPOs (rows with an IPO Date)
     # Including Inactive companies to avoid survivorship bias
     ipo_universe = df[df['ipodate'].notnull()].copy()
-    
+
     return ipo_universe
 
+NS_PER_DAY = 86_400_000_000_000
+
+# Integer representation of NaT when datetime64 data is viewed as int64
+_NAT_NS = np.iinfo(np.int64).min
+
+class PeerIndex:
+    """
+    Precomputed lookup structures over the IPO universe for peer search.
+
+    Dates are converted to int64 nanoseconds and each sector's row
+    positions are indexed once up front, so every subsequent get_peers
+    call is a scalar-vs-array comparison over one sector's rows instead
+    of repeated boolean scans of the whole DataFrame.
+
+    Args:
+        ipo_universe (pd.DataFrame): DataFrame containing all IPO data
+    """
+
+    def __init__(self, ipo_universe):
+        self.ipodate_ns = ipo_universe['ipodate'].values.astype('datetime64[ns]').view('i8')
+        self.rdq_ns = ipo_universe['rdq'].values.astype('datetime64[ns]').view('i8')
+        self.mkv = ipo_universe['mkvaltq'].to_numpy(dtype=np.float64)
+        # na_value=None keeps equality comparisons plain-bool; pd.NA would
+        # poison the boolean masks below
+        self.tic = ipo_universe['tic'].to_numpy(dtype=object, na_value=None)
+        self.gsector = ipo_universe['gsector'].to_numpy(dtype=object, na_value=None)
+        self.sector_to_idx = {
+            s: np.flatnonzero((ipo_universe['gsector'] == s).to_numpy(dtype=bool, na_value=False))
+            for s in ipo_universe['gsector'].dropna().unique()
+        }
+
 def get_peers(ipo_universe, target_ticker, n_peers=10):
     """
     Finds the top historical peers for a target IPO based on:
@@ -32,38 +176,62 @@ def get_peers(ipo_universe, target_ticker, n_peers=10):
     - Closest Market Cap (mkvaltq)
     - Strictly historical (Peer IPO Date < Target IPO Date)
     - Reporting Lag (Peer RDQ < Target IPO Date - 45 days)
-    
+
     Args:
-        ipo_universe (pd.DataFrame): DataFrame containing all IPO data
+        ipo_universe (pd.DataFrame or PeerIndex): IPO universe, either as
+            the raw DataFrame or a prebuilt PeerIndex (which amortizes
+            the filtering setup across many targets)
         target_ticker (str): Ticker symbol of the target IPO
         n_peers (int): Number of peers to return
-    
+
     Returns:
         list: List of peer ticker symbols
     """
-    target = ipo_universe[ipo_universe['tic'] == target_ticker].iloc[0]
-    target_date = target['ipodate']
-    target_sector = target['gsector']
-    target_val = target['mkvaltq']
+    if not isinstance(ipo_universe, PeerIndex):
+        ipo_universe = PeerIndex(ipo_universe)
+    index = ipo_universe
 
-    # Potential peers: same sector, went public before target
-    potential_peers = ipo_universe[
-        (ipo_universe['gsector'] == target_sector) & 
-        (ipo_universe['ipodate'] < target_date) &
-        (ipo_universe['tic'] != target_ticker)
-    ].copy()
+    pos = np.flatnonzero(index.tic == target_ticker)[0]
+    t_ns = index.ipodate_ns[pos]
+    target_sector = index.gsector[pos]
+    target_val = index.mkv[pos]
 
-    # Apply 45-day reporting lag: Peer must have reported fundamentals before target's IPO
-    potential_peers = potential_peers[potential_peers['rdq'] < (target_date - pd.Timedelta(days=45))]
+    if t_ns == _NAT_NS or pd.isna(target_sector) or target_sector not in index.sector_to_idx:
+        return []
 
-    if potential_peers.empty:
+    # Potential peers: same sector, went public before target, and
+    # reported fundamentals at least 45 days before the target's IPO -
+    # all conditions fused into one boolean pass over the sector's rows
+    idx = index.sector_to_idx[target_sector]
+    cutoff_ns = t_ns - 45 * NS_PER_DAY
+    ipodate_ns = index.ipodate_ns[idx]
+    rdq_ns = index.rdq_ns[idx]
+    mask = (
+        (ipodate_ns != _NAT_NS) & (ipodate_ns < t_ns) &
+        (rdq_ns != _NAT_NS) & (rdq_ns < cutoff_ns) &
+        (index.tic[idx] != target_ticker)
+    )
+
+    cand = idx[mask]
+    if cand.size == 0:
         return []
 
-    # Calculate 'Valuation Distance'
-    potential_peers['dist'] = (potential_peers['mkvaltq'] - target_val).abs()
-    
+    # Rank 'Valuation Distance' in NumPy: argpartition is O(N) and avoids
+    # the DataFrame copy and full sort of the pandas path
+    tics = index.tic[cand]
+
+    if np.isnan(target_val):
+        # No market cap to rank on - fall back to candidate order
+        return tics[:n_peers].tolist()
+
+    dist = np.abs(index.mkv[cand] - target_val)
+
+    k = min(n_peers, len(dist))
+    idx = np.argpartition(dist, k - 1)[:k]
+    idx = idx[np.argsort(dist[idx], kind='stable')]
+
     # Return top N closest peers by Market Cap
-    return potential_peers.sort_values('dist')['tic'].head(n_peers).tolist()
+    return tics[idx].tolist()
 
 def get_target_list(ipo_universe, sector_code=45, start_date='2024-01-01'):
     """
@@ -96,103 +264,200 @@ def build_peer_mapping(ipo_universe, targets, n_peers=10):
     Returns:
         dict: Mapping of target ticker to list of peer tickers
     """
-    peer_map = {t: get_peers(ipo_universe, t, n_peers) for t in targets}
+    index = PeerIndex(ipo_universe)
+    peer_map = {t: get_peers(index, t, n_peers) for t in targets}
     return peer_map
 
-def load_realized_volatility_from_wrds(target_ticker, peer_tickers, start_date, end_date, username=None):
+def build_peer_mapping_vec(ipo_universe, targets, n_peers=10):
+    """
+    Vectorized version of build_peer_mapping.
+
+    Instead of re-filtering the full universe once per target (O(T*N) pandas
+    work), candidates are grouped by sector once and every target in a sector
+    is matched against that sector's candidate pool in a single NumPy
+    broadcast, so the hot path is NumPy-bound rather than Python-loop-bound.
+    Applies the same rules as get_peers: same sector, strictly historical
+    IPO date, 45-day reporting lag, closest market cap.
+
+    Args:
+        ipo_universe (pd.DataFrame): DataFrame containing all IPO data
+        targets (numpy.ndarray): Array of target ticker symbols
+        n_peers (int): Number of peers to find for each target
+
+    Returns:
+        dict: Mapping of target ticker to list of peer tickers
+    """
+    peer_map = {t: [] for t in targets}
+
+    # Candidates need valid dates, market cap and sector to be comparable
+    pool = ipo_universe.dropna(subset=['ipodate', 'rdq', 'mkvaltq', 'gsector'])
+    target_rows = ipo_universe[ipo_universe['tic'].isin(targets)].drop_duplicates('tic')
+    lag = np.timedelta64(45, 'D')
+
+    for sector, cand in pool.groupby('gsector', observed=True):
+        tgt = target_rows[target_rows['gsector'] == sector]
+        if tgt.empty:
+            continue
+
+        ipodate_p = cand['ipodate'].to_numpy()
+        rdq_p = cand['rdq'].to_numpy()
+        mkv_p = cand['mkvaltq'].to_numpy(dtype=np.float64)
+        tic_p = cand['tic'].to_numpy()
+
+        tdate = tgt['ipodate'].to_numpy()
+        tval = tgt['mkvaltq'].to_numpy(dtype=np.float64)
+        ttic = tgt['tic'].to_numpy()
+
+        # One (targets x candidates) broadcast covers the whole sector
+        valid = (
+            (ipodate_p[None, :] < tdate[:, None]) &
+            (rdq_p[None, :] < (tdate[:, None] - lag)) &
+            (tic_p[None, :] != ttic[:, None])
+        )
+        dist = np.abs(mkv_p[None, :] - tval[:, None])
+        # Targets with no market cap fall back to candidate order, matching
+        # the stable sort in get_peers
+        no_val = ~np.isfinite(tval)
+        if no_val.any():
+            dist[no_val] = np.arange(dist.shape[1], dtype=np.float64)
+        dist[~valid] = np.inf
+
+        k = min(n_peers, dist.shape[1])
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        for i, ticker in enumerate(ttic):
+            idx = top[i][np.argsort(dist[i, top[i]], kind='stable')]
+            idx = idx[np.isfinite(dist[i, idx])]
+            peer_map[ticker] = tic_p[idx].tolist()
+
+    return peer_map
+
+# Per-ticker absolute-return series keyed by (ticker, start, end),
+# shared across targets so overlapping peer sets are loaded once
+_RV_SERIES = {}
+
+@functools.lru_cache(maxsize=128)
+def _peer_avg_cached(peer_key, start_date, end_date):
+    """
+    Average the stored per-ticker RV series for one peer set.
+
+    Targets in the same sector often share most of their peer list, so
+    the average is memoized on the (sorted) peer set and date range and
+    recomputed only for genuinely new combinations.
+
+    Args:
+        peer_key (tuple): Sorted peer tickers
+        start_date (str): Start date of the loaded range
+        end_date (str): End date of the loaded range
+
+    Returns:
+        pd.Series: Peer-average realized volatility per date
+    """
+    series = [_RV_SERIES[(t, start_date, end_date)] for t in peer_key]
+    idx = series[0].index
+    for s in series[1:]:
+        idx = idx.union(s.index)
+
+    # One wide float buffer, scattered into via precomputed positions
+    mat = np.full((len(idx), len(series)), np.nan)
+    for j, s in enumerate(series):
+        mat[idx.get_indexer(s.index), j] = s.to_numpy()
+
+    valid = (~np.isnan(mat)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg = np.where(valid > 0, np.nansum(mat, axis=1) / valid, np.nan)
+
+    return pd.Series(avg, index=idx)
+
+def load_realized_volatility_from_wrds(target_ticker, peer_tickers, start_date, end_date, username=None, db=None):
     """
     Load realized volatility data from WRDS Cloud for target and peer stocks.
-    
+
     Args:
         target_ticker (str): Target stock ticker
         peer_tickers (list): List of peer stock tickers
         start_date (str): Start date for data retrieval (YYYY-MM-DD)
         end_date (str): End date for data retrieval (YYYY-MM-DD)
         username (str): WRDS username (if None, will prompt for input)
-    
+        db (wrds.Connection): Existing connection to use; if None, the
+            shared lazily-opened connection is used
+
     Returns:
         pd.DataFrame: DataFrame with 'Actual' and 'Peer_Prior' columns
     """
-    try:
-        # Connect to WRDS with fresh authentication
-        db = wrds.Connection(wrds_username=username)
-    except Exception as e:
-        print(f"Failed to connect to WRDS: {e}")
-        return None
-    
+    if db is None:
+        try:
+            db = _get_db(username)
+        except Exception as e:
+            print(f"Failed to connect to WRDS: {e}")
+            return None
+
     all_tickers = [target_ticker] + peer_tickers
     # Clean tickers - remove special characters like '.' and numbers
     cleaned_tickers = [ticker.split('.')[0] for ticker in all_tickers]
-    rv_data = {}
-    
+    target_clean = cleaned_tickers[0]
+    peer_clean = cleaned_tickers[1:]
+
+    try:
+        # Fetch every ticker in one joined query instead of two round-trips
+        # per ticker - wall time here is network-bound, not CPU-bound.
+        # Bound parameters keep the server-side plan reusable across runs
+        # and rule out injection via ticker strings.
+        query = """
+        SELECT s.ticker, d.date, d.ret
+        FROM crsp_a_stock.stocknames s
+        JOIN crsp_a_stock.dsf d ON s.permno = d.permno
+        WHERE s.ticker IN %(tickers)s
+        AND d.date BETWEEN %(start)s AND %(end)s
+        AND s.namedt <= %(end)s
+        AND s.nameenddt >= %(start)s
+        """
+        params = {
+            'tickers': tuple(cleaned_tickers),
+            'start': start_date,
+            'end': end_date,
+        }
+
+        data = _cached_sql(db, query, params=params)
+    except Exception as e:
+        print(f"Error fetching data: {e}")
+        return None
+
+    data = data.dropna(subset=['ret'])
+    if data.empty:
+        print("No data found for requested tickers")
+        return None
+
+    # Calculate realized volatility as absolute daily returns, then pivot
+    # locally to one wide date x ticker frame
+    data['ret'] = data['ret'].abs()
+    wide = data.pivot_table(index='date', columns='ticker', values='ret')
+
     for ticker in cleaned_tickers:
-        try:
-            # First, get the permno for the ticker
-            ticker_query = f"""
-            SELECT DISTINCT permno, ticker
-            FROM crsp_a_stock.stocknames
-            WHERE ticker = '{ticker}'
-            AND namedt <= '{end_date}'
-            AND nameenddt >= '{start_date}'
-            """
-            
-            ticker_data = db.raw_sql(ticker_query)
-            if ticker_data.empty:
-                print(f"No permno found for ticker {ticker}")
-                continue
-                
-            permno = ticker_data['permno'].iloc[0]
-            
-            # Query CRSP daily data for realized volatility calculation
-            query = f"""
-            SELECT date, ret
-            FROM crsp_a_stock.dsf 
-            WHERE permno = {permno}
-            AND date BETWEEN '{start_date}' AND '{end_date}'
-            ORDER BY date
-            """
-            
-            data = db.raw_sql(query)
-            if not data.empty:
-                # Calculate realized volatility as absolute daily returns
-                data = data.dropna()
-                if len(data) > 0:
-                    rv_data[ticker] = data.set_index('date')['ret'].abs()  # Use absolute returns as RV proxy
-                else:
-                    print(f"No valid returns data for {ticker}")
-            else:
-                print(f"No data found for {ticker}")
-                
-        except Exception as e:
-            print(f"Error fetching data for {ticker}: {e}")
-            continue
-    
-    db.close()
-    
-    # Create the final DataFrame
-    if target_ticker in rv_data and len(rv_data) > 1:
-        # Create target series
-        target_series = rv_data[target_ticker]
-        
-        # Calculate peer average (excluding target)
-        peer_series_list = [rv_data[ticker] for ticker in peer_tickers if ticker in rv_data]
-        if peer_series_list:
-            peer_avg = pd.concat(peer_series_list, axis=1).mean(axis=1)
-        else:
-            print("Warning: No peer data available")
-            return None
-        
-        # Align and create final DataFrame
-        final_df = pd.DataFrame({
-            'Actual': target_series,
-            'Peer_Prior': peer_avg.shift(1)  # Use lagged peer average
-        }).dropna()
-        
-        return final_df
-    else:
+        if ticker not in wide.columns:
+            print(f"No data found for {ticker}")
+
+    peer_cols = [ticker for ticker in peer_clean if ticker in wide.columns]
+    if target_clean not in wide.columns or not peer_cols:
         print("Insufficient data to create forecasting dataset")
         return None
 
+    # Stash each ticker's series so later targets that share peers reuse
+    # them without another fetch or average
+    for ticker in wide.columns:
+        _RV_SERIES[(ticker, start_date, end_date)] = wide[ticker].dropna()
+
+    # Peer average is memoized per (peer set, date range); dates where no
+    # peer traded stay NaN and drop out below
+    peer_avg = _peer_avg_cached(tuple(sorted(peer_cols)), start_date, end_date)
+
+    # Align and create final DataFrame
+    final_df = pd.DataFrame({
+        'Actual': wide[target_clean],
+        'Peer_Prior': peer_avg.reindex(wide.index).shift(1)  # Use lagged peer average
+    }).dropna()
+
+    return final_df
+
 def create_sample_realized_volatility_data(start_date, end_date):
     """
     Create sample realized volatility data for testing when WRDS is not available.
@@ -212,18 +477,26 @@ def create_sample_realized_volatility_data(start_date, end_date):
     target_data = np.random.exponential(0.02, len(dates))
     peer_data = np.random.exponential(0.018, len(dates))
     
-    # Add some autocorrelation and volatility clustering
-    for i in range(2, len(target_data)):
-        target_data[i] = 0.7 * target_data[i-1] + 0.3 * target_data[i]
-        peer_data[i] = 0.7 * peer_data[i-1] + 0.3 * peer_data[i]
+    # Add some autocorrelation and volatility clustering via a compiled
+    # IIR filter: x[i] = 0.7 * x[i-1] + 0.3 * x[i], seeded so the first
+    # two raw draws are kept as before
+    if len(dates) > 2:
+        target_data[2:], _ = lfilter([0.3], [1, -0.7], target_data[2:], zi=[0.7 * target_data[1]])
+        peer_data[2:], _ = lfilter([0.3], [1, -0.7], peer_data[2:], zi=[0.7 * peer_data[1]])
     
+    # Lag peer data by one day with an explicit leading NaN (np.roll would
+    # copy the whole array and wrap the last value to the front)
+    peer_lag = np.empty_like(peer_data)
+    peer_lag[0] = np.nan
+    peer_lag[1:] = peer_data[:-1]
+
     final_df = pd.DataFrame({
         'Actual': target_data,
-        'Peer_Prior': np.roll(peer_data, 1)  # Lagged peer data
+        'Peer_Prior': peer_lag
     }, index=dates)
-    
-    # Remove first row due to lag and any remaining NaN values
-    final_df = final_df.iloc[1:].dropna()
+
+    # The leading NaN row from the lag drops out here
+    final_df = final_df.dropna()
     
     print(f"✅ Created sample RV data with {len(final_df)} observations")
     return final_df
@@ -1,23 +1,27 @@
 import numpy as np
-from sklearn.metrics import mean_squared_error
 
 def evaluate_forecast(results_df):
     """
     Evaluate forecast performance using RMSE and skill score.
-    
+
     Args:
         results_df (pd.DataFrame): DataFrame with 'Actual' and 'Forecast' columns
-    
+
     Returns:
         dict: Dictionary containing performance metrics
     """
+    actual = results_df['Actual'].to_numpy(dtype=np.float64)
+    forecast = results_df['Forecast'].to_numpy(dtype=np.float64)
+
     # Calculate Forecast Error
-    rmse = np.sqrt(mean_squared_error(results_df['Actual'], results_df['Forecast']))
-    
-    # Calculate Naive Error (Baseline)
-    naive_forecast = results_df['Actual'].shift(1).fillna(method='bfill')
-    naive_rmse = np.sqrt(mean_squared_error(results_df['Actual'], naive_forecast))
-    
+    rmse = np.sqrt(np.mean((actual - forecast) ** 2))
+
+    # Calculate Naive Error (Baseline): previous observation carried forward
+    naive_forecast = np.empty_like(actual)
+    naive_forecast[0] = actual[0]
+    naive_forecast[1:] = actual[:-1]
+    naive_rmse = np.sqrt(np.mean((actual - naive_forecast) ** 2))
+
     improvement = (naive_rmse - rmse) / naive_rmse
     
     metrics = {
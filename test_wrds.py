@@ -30,13 +30,19 @@ def create_sample_data():
     target_data = np.random.exponential(0.02, len(dates))  # Simulate RV with exponential distribution
     peer_data = np.random.exponential(0.018, len(dates))
     
+    # Lag peer data by one day with an explicit leading NaN (np.roll would
+    # copy the whole array and wrap the last value to the front)
+    peer_lag = np.empty_like(peer_data)
+    peer_lag[0] = np.nan
+    peer_lag[1:] = peer_data[:-1]
+
     final_df = pd.DataFrame({
         'Actual': target_data,
-        'Peer_Prior': np.roll(peer_data, 1)  # Lagged peer data
+        'Peer_Prior': peer_lag
     }, index=dates)
-    
-    # Remove first row due to lag
-    final_df = final_df.iloc[1:]
+
+    # The leading NaN row from the lag drops out here
+    final_df = final_df.dropna()
     
     print(f"✅ Created sample data with {len(final_df)} observations")
     return final_df